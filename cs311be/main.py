@@ -1,8 +1,13 @@
+import os
+import sys
+
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi import status, Request
 from src.routers.emotion_router import router as emotion_router
 from src.routers.mock_agent_router import router as mock_agent_router
@@ -12,7 +17,21 @@ from src.routers import (
     resume_router,
     db_router
 )
-app = FastAPI()
+from src.routers.dependencies import get_emotion_service, get_evaluation_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # build heavy services per worker (after fork), not at import time
+    get_emotion_service()
+    get_evaluation_service()
+    yield
+    emotion = get_emotion_service()
+    emotion.close_all_logs()
+    emotion.stop_camera()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,7 +60,13 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=3005,
-        workers=1,
+        # Mock sessions and the webcam are held in-process, so keep a single
+        # worker unless UVICORN_WORKERS is set explicitly.
+        workers=int(os.getenv("UVICORN_WORKERS", "1")),
+        # uvloop has no Windows build; fall back to the default asyncio loop there
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        log_level="warning",
         # ssl_keyfile="/etc/letsencrypt/live/api.sdhchatbot.top/privkey.pem",
         # ssl_certfile="/etc/letsencrypt/live/api.sdhchatbot.top/fullchain.pem"
     )
@@ -80,6 +80,14 @@ class LLMEngine:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"LLMEngine.chat error: {e}")
 
+    async def achat(self, messages: List[Dict[str, str]]) -> str:
+        try:
+            chat_msgs = [ChatMessage(role=m["role"], content=m["content"]) for m in messages]
+            resp = await self.openai_llm.achat(chat_msgs)
+            return resp.message.content
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"LLMEngine.achat error: {e}")
+
 @lru_cache(maxsize=1)
 def get_llm_engine() -> LLMEngine:
     return LLMEngine()
\ No newline at end of file
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from src.services.service import Service
 
 service = Service()
@@ -6,4 +8,23 @@ async def get_service() -> Service:
     """
     Resume Flow Service
     """
-    return service
\ No newline at end of file
+    return service
+
+
+@lru_cache(maxsize=1)
+def get_emotion_service():
+    """
+    Emotion Service (camera + DeepFace model), built lazily once per worker.
+    Import stays local so TensorFlow is not loaded before uvicorn forks workers.
+    """
+    from src.services.emotion_service import EmotionService
+    return EmotionService(cam_index=0, fps=6.0)
+
+
+@lru_cache(maxsize=1)
+def get_evaluation_service():
+    """
+    Evaluation Service, built lazily once per worker
+    """
+    from src.services.evaluation_service import EvaluationService
+    return EvaluationService(base_dir="exports")
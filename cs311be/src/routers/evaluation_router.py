@@ -1,13 +1,14 @@
 # src/routers/evaluation_router.py
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 
+from src.routers.dependencies import get_evaluation_service
 from src.services.evaluation_service import EvaluationService
 
 router = APIRouter(prefix="/evaluation", tags=["evaluation"])
-_service = EvaluationService(base_dir="exports")
 
 
 class EvaluateReq(BaseModel):
@@ -26,11 +27,29 @@ class EvaluateReq(BaseModel):
     w_agent_final: float = 0.65
     w_emotion: float = 0.35
 
+    # scores-only judge (không reasons/evidence); None -> theo env JUDGE_FAST
+    fast: bool | None = None
+
+
+class EvaluateSessionsReq(BaseModel):
+    session_ids: list[str]
+    role: str | None = "ai_engineer"
+    base_dir: str | None = None
+
+    w_knowledge: float = 0.7
+    w_attitude: float = 0.3
+    w_agent_final: float = 0.65
+    w_emotion: float = 0.35
+    fast: bool | None = None
+
+    # số judge call song song tối đa
+    max_concurrency: int = Field(5, ge=1, le=20)
+
 
 @router.post("/evaluate")
-def evaluate(req: EvaluateReq):
+async def evaluate(req: EvaluateReq, service: EvaluationService = Depends(get_evaluation_service)):
     try:
-        report = _service.evaluate(
+        report = await service.evaluate_async(
             session_id=req.session_id,
             role=req.role,
             base_dir=req.base_dir,
@@ -40,11 +59,35 @@ def evaluate(req: EvaluateReq):
             w_attitude=req.w_attitude,
             w_agent_final=req.w_agent_final,
             w_emotion=req.w_emotion,
+            fast=req.fast,
         )
-        return {"ok": True, "report": report}
+        return ORJSONResponse({"ok": True, "report": report})
 
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {e}")
+
+
+@router.post("/evaluate_sessions")
+async def evaluate_sessions(req: EvaluateSessionsReq, service: EvaluationService = Depends(get_evaluation_service)):
+    # nhiều session 1 request (realtime, song song); backfill lớn -> EvaluationService.evaluate_many (Batch API)
+    if not req.session_ids:
+        raise HTTPException(status_code=400, detail="session_ids must not be empty")
+    try:
+        reports = await service.evaluate_concurrent(
+            req.session_ids,
+            max_concurrency=req.max_concurrency,
+            role=req.role,
+            base_dir=req.base_dir,
+            w_knowledge=req.w_knowledge,
+            w_attitude=req.w_attitude,
+            w_agent_final=req.w_agent_final,
+            w_emotion=req.w_emotion,
+            fast=req.fast,
+        )
+        return ORJSONResponse({"ok": True, "reports": reports})
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {e}")
@@ -1,20 +1,25 @@
 from pathlib import Path
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import ORJSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 from typing import Any
 from datetime import datetime
-import json  # NEW
+from functools import lru_cache
+import orjson
+import re
+import threading
+import time
 
 from src.schemas.mock_agent import StartMockRequest, StartMockResponse, MockTurnRequest, MockTurnResponse
 from src.services.mock_agent_service import MockAgentService
 
 # NEW: import evaluation
+from src.routers.dependencies import get_evaluation_service
 from src.services.evaluation_service import EvaluationService
 
 router = APIRouter(prefix="/mock", tags=["mock-agent"])
 _service = MockAgentService()
 
-# NEW: singleton eval service
-_eval_service = EvaluationService(base_dir="exports")
 def _print_agent_evidence(explanation: dict):
     """
     Print K1..K5 + A1..A5 evidence nicely.
@@ -127,8 +132,16 @@ def _extract_agent_details(explanation: dict) -> dict:
     }
     return out
 
+_UNSAFE_SID_RE = re.compile(r"[^\w-]")
+
+
+@lru_cache(maxsize=1024)
 def _safe_sid(session_id: str) -> str:
-    return "".join(ch for ch in (session_id or "") if ch.isalnum() or ch in ("-", "_"))
+    # \w = str.isalnum() + "_" -> giữ đúng tập ký tự như filter cũ
+    return _UNSAFE_SID_RE.sub("", session_id or "")
+
+
+_PRETTY_JSON = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
 
 
 def _normalize_role_text(jd_text: Any) -> str:
@@ -143,19 +156,24 @@ def _normalize_role_text(jd_text: Any) -> str:
             if isinstance(v, str) and v.strip():
                 return v.strip()
         # fallback: dump json pretty
-        return json.dumps(jd_text, ensure_ascii=False, indent=2)
+        return orjson.dumps(jd_text, option=_PRETTY_JSON).decode("utf-8")
 
     # 3) list/other: dump json
     try:
-        return json.dumps(jd_text, ensure_ascii=False, indent=2)
+        return orjson.dumps(jd_text, option=_PRETTY_JSON).decode("utf-8")
     except Exception:
         return str(jd_text)
+@lru_cache(maxsize=256)
+def _read_role_file(path: str, mtime_ns: int, size: int) -> str:
+    return Path(path).read_text(encoding="utf-8").strip()
 def _load_role_text(session_id: str) -> str:
     sid = _safe_sid(session_id)
     fp = Path("exports") / f"role_{sid}.txt"
-    if fp.exists():
-        return fp.read_text(encoding="utf-8").strip()
-    return ""
+    try:
+        st = fp.stat()
+    except FileNotFoundError:
+        return ""
+    return _read_role_file(str(fp), st.st_mtime_ns, st.st_size)
 def _save_role_text(session_id: str, jd_text: Any) -> str:
     Path("exports").mkdir(exist_ok=True)
     sid = _safe_sid(session_id)
@@ -166,18 +184,21 @@ def _save_role_text(session_id: str, jd_text: Any) -> str:
     return str(fp)
 
 
-@router.post("/start", response_model=StartMockResponse)
-def start_mock(payload: StartMockRequest):
+# response model chỉ dùng cho OpenAPI docs (responses=...), không response_model -> FastAPI không validate lại output
+@router.post("/start", responses={200: {"model": StartMockResponse}})
+async def start_mock(payload: StartMockRequest):
     try:
         # NEW: lưu job_description (jd_text) như là role user miêu tả
         # vì FE startMockSession chỉ gửi jd_text chứ không gửi role :contentReference[oaicite:1]{index=1}
         print(payload.jd_text)
-        _save_role_text(payload.session_id, payload.jd_text)
+        await run_in_threadpool(_save_role_text, payload.session_id, payload.jd_text)
 
         # NEW: nếu payload.role rỗng -> dùng luôn jd_text làm role
         role_text = (payload.role or "").strip() or _normalize_role_text(payload.jd_text)
-        first_q = _service.start_session(payload.session_id, payload.cv_text, payload.jd_text, role_text)
-        return StartMockResponse(session_id=payload.session_id, first_question=first_q)
+        first_q = await run_in_threadpool(
+            _service.start_session, payload.session_id, payload.cv_text, payload.jd_text, role_text
+        )
+        return ORJSONResponse({"session_id": payload.session_id, "first_question": first_q})
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -185,17 +206,17 @@ def start_mock(payload: StartMockRequest):
         raise HTTPException(status_code=500, detail=f"start_mock failed: {e}")
 
 
-@router.post("/turn", response_model=MockTurnResponse)
-def mock_turn(payload: MockTurnRequest):
+@router.post("/turn", responses={200: {"model": MockTurnResponse}})
+async def mock_turn(payload: MockTurnRequest):
     try:
-        data = _service.process_turn(payload.session_id, payload.user_answer)
-        return MockTurnResponse(
-            session_id=payload.session_id,
-            timestamp=datetime.utcnow(),
-            reasoning_summary=data["reasoning_summary"],
-            next_question=data["next_question"],
-            followups=data.get("followups", []),
-        )
+        data = await _service.process_turn(payload.session_id, payload.user_answer)
+        return ORJSONResponse({
+            "session_id": payload.session_id,
+            "timestamp": datetime.utcnow(),
+            "reasoning_summary": data["reasoning_summary"],
+            "next_question": data["next_question"],
+            "followups": data.get("followups", []),
+        })
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -203,32 +224,101 @@ def mock_turn(payload: MockTurnRequest):
         raise HTTPException(status_code=500, detail=f"mock_turn failed: {e}")
 
 
+def _compute_auto_eval(eval_service: EvaluationService, session_id: str) -> dict:
+    role_text = _load_role_text(session_id)
+
+    report = eval_service.evaluate(
+        session_id=session_id,
+        role=role_text or None,
+        base_dir="exports",
+        w_knowledge=0.7,
+        w_attitude=0.3,
+        w_agent_final=0.65,
+        w_emotion=0.35,
+    )
+    overall = report.get("overall", {})
+    auto_eval = dict(overall)
+
+    explanation = report.get("agent", {}).get("explanation")
+    if explanation:
+        auto_eval.update(_extract_agent_details(explanation))
+    return auto_eval
+
+
+def _eval_result_path(session_id: str) -> Path:
+    return Path("exports") / f"eval_{_safe_sid(session_id)}.json"
+
+
+_EVAL_JSON = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+_eval_status_lock = threading.Lock()
+
+
+def _write_eval_status(fp: Path, result: dict, token: int) -> bool:
+    """
+    Persist the status of export request `token` (time_ns lúc export). Skipped if a newer export
+    of the same session already wrote its status, so a slow older eval can't overwrite it.
+    """
+    with _eval_status_lock:
+        try:
+            current = int(orjson.loads(fp.read_bytes()).get("eval_token") or 0)
+        except Exception:  # chưa có file / file hỏng
+            current = 0
+        if current > token:
+            print(f"[eval_status] skip stale result for {fp.name} (token {token} < {current})")
+            return False
+        tmp = fp.with_name(f"{fp.name}.{token}.tmp")
+        tmp.write_bytes(orjson.dumps({**result, "eval_token": token}, option=_EVAL_JSON))
+        tmp.replace(fp)
+        return True
+
+
+def _run_eval_and_persist(eval_service: EvaluationService, session_id: str, token: int) -> None:
+    fp = _eval_result_path(session_id)
+    try:
+        result = {"ok": True, "status": "done", "auto_eval": _compute_auto_eval(eval_service, session_id)}
+        _write_eval_status(fp, result, token)
+    except Exception as e:
+        # lỗi eval hoặc lỗi serialize/ghi file -> vẫn phải ghi status, nếu không FE poll "pending" mãi
+        print("export_mock background eval error:", e)
+        _write_eval_status(fp, {"ok": False, "status": "failed", "error": f"{type(e).__name__}: {e}"}, token)
+
+
 @router.post("/export")
-def export_mock(session_id: str):
+async def export_mock(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
+    eval_service: EvaluationService = Depends(get_evaluation_service),
+):
     try:
-        path = _service.export_transcript_txt(session_id)
-
-        role_text = _load_role_text(session_id)
-
-        report = _eval_service.evaluate(
-            session_id=session_id,
-            role=role_text or None,
-            base_dir="exports",
-            w_knowledge=0.7,
-            w_attitude=0.3,
-            w_agent_final=0.65,
-            w_emotion=0.35,
-        )
-        overall = report.get("overall", {})
-        auto_eval = dict(overall)
+        path = await run_in_threadpool(_service.export_transcript_txt, session_id)
 
-        explanation = report.get("agent", {}).get("explanation")
-        if explanation:
-            auto_eval.update(_extract_agent_details(explanation))
+        # background=true: trả về ngay, FE poll GET /mock/eval_status/{session_id}
+        if background:
+            # token của lần export này: task cũ hơn (còn đang chạy) không ghi đè được status mới
+            token = time.time_ns()
+            pending = {"ok": True, "status": "pending", "auto_eval": None}
+            await run_in_threadpool(_write_eval_status, _eval_result_path(session_id), pending, token)
+            background_tasks.add_task(_run_eval_and_persist, eval_service, session_id, token)
+            return ORJSONResponse(
+                {"ok": True, "path": path, "auto_eval": None, "eval_status": "pending", "eval_token": token}
+            )
 
-        return {"ok": True, "path": path, "auto_eval": auto_eval}
+        auto_eval = await run_in_threadpool(_compute_auto_eval, eval_service, session_id)
+        return ORJSONResponse({"ok": True, "path": path, "auto_eval": auto_eval})
 
 
     except Exception as e:
         print("export_mock error:", e)
         raise HTTPException(status_code=500, detail=f"export_mock failed: {type(e).__name__}: {e}")
+
+
+@router.get("/eval_status/{session_id}")
+def eval_status(session_id: str):
+    fp = _eval_result_path(session_id)
+    if not fp.exists():
+        return ORJSONResponse({"ok": True, "status": "pending", "auto_eval": None})
+    # file đã là JSON (orjson) -> trả thẳng bytes, không decode/encode lại
+    return Response(content=fp.read_bytes(), media_type="application/json")
@@ -1,15 +1,36 @@
+import os
+import sys
+
 import cv2
 import numpy as np
 import threading
 import time
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, Any, Set
+from typing import Optional, Dict, Any, List, Set, TextIO, Tuple
 
 from deepface import DeepFace
 
+# Optional: MediaPipe BlazeFace (nhẹ hơn Haar cascade); không có thì fallback Haar
+try:
+    import mediapipe as mp  # type: ignore
+except Exception:
+    mp = None
+
+# Optional: ONNX Runtime chạy bản INT8 của emotion model (nếu đã export, xem export_int8_onnx)
+try:
+    import onnxruntime as ort  # type: ignore
+except Exception:
+    ort = None
+
 emotion_labels = ['angry','disgust','fear','happy','sad','surprise','neutral']
 
+EMOTION_ONNX_PATH = os.getenv("EMOTION_ONNX_PATH", "src/config/emotion.int8.onnx")
+
+
+def _iso_z(now=datetime.utcnow) -> str:
+    return now().isoformat(timespec="milliseconds") + "Z"
+
 
 class EmotionService:
     def __init__(self, cam_index: int = 0, fps: float = 6.0, log_interval_sec: int = 10):
@@ -20,10 +41,32 @@ class EmotionService:
 
         self.model = inner_model
         self.model_lock = threading.Lock()
+        # input buffers cấp phát 1 lần, tái sử dụng mỗi frame
+        self._gray_buf = np.empty((48, 48), dtype=np.uint8)
+        self._in_buf = np.empty((1, 48, 48, 1), dtype=np.float32)
+
+        self._ort_sess = None
+        self._ort_input = None
+        if ort is not None and Path(EMOTION_ONNX_PATH).exists():
+            try:
+                self._ort_sess = ort.InferenceSession(EMOTION_ONNX_PATH, providers=["CPUExecutionProvider"])
+                self._ort_input = self._ort_sess.get_inputs()[0].name
+                print(f"[emotion] using ONNX Runtime model: {EMOTION_ONNX_PATH}")
+            except Exception as e:
+                print("[emotion] ONNX model load failed, using Keras:", e)
+                self._ort_sess = None
 
         self.face_cascade = cv2.CascadeClassifier(
             cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
         )
+        self._face_det = None
+        if mp is not None:
+            try:
+                self._face_det = mp.solutions.face_detection.FaceDetection(
+                    model_selection=0, min_detection_confidence=0.5
+                )
+            except Exception as e:
+                print("[emotion] mediapipe face detection unavailable, using Haar:", e)
 
         self.cam_index = cam_index
         self.fps = fps
@@ -40,6 +83,10 @@ class EmotionService:
 
         self._lock = threading.Lock()
 
+        # 1 file handle (line-buffered, append) / session, mở ở start_logging, đóng ở stop_logging
+        self._log_files: Dict[str, TextIO] = {}
+        Path("exports").mkdir(exist_ok=True)
+
     # ---------- camera ----------
     def start_camera(self):
         if self._cam_thread is not None and self._cam_thread.is_alive():
@@ -65,6 +112,10 @@ class EmotionService:
     def start_logging(self, session_id: str):
         with self._lock:
             self._logging_sessions.add(session_id)
+            if session_id not in self._log_files:
+                safe_sid = "".join(ch for ch in session_id if ch.isalnum() or ch in ("-", "_"))
+                fp = Path("exports") / f"emotion_{safe_sid}.txt"
+                self._log_files[session_id] = fp.open("a", encoding="utf-8", buffering=1)
 
         print(f"[emotion] start_logging session={session_id} active={len(self._logging_sessions)}")
 
@@ -84,6 +135,10 @@ class EmotionService:
         with self._lock:
             self._logging_sessions.discard(session_id)
             empty = (len(self._logging_sessions) == 0)
+            f = self._log_files.pop(session_id, None)
+
+        if f is not None:
+            f.close()
 
         print(f"[emotion] stop_logging session={session_id} remaining={len(self._logging_sessions)}")
 
@@ -93,23 +148,37 @@ class EmotionService:
             print("[emotion] no active sessions -> stopping log + camera")
             self._stop_log.set()
             self.stop_camera()
-    def _append_line(self, session_id: str, note: str = ""):
-        try:
-            Path("exports").mkdir(exist_ok=True)
 
-            safe_sid = "".join(ch for ch in session_id if ch.isalnum() or ch in ("-", "_"))
-            fp = Path("exports") / f"emotion_{safe_sid}.txt"
+    def close_all_logs(self):
+        """Shutdown: dừng log thread rồi flush + đóng mọi file log còn mở (client không gọi stop_logging)."""
+        self._stop_log.set()
+        t = self._log_thread
+        if t is not None and t.is_alive():
+            t.join(timeout=self.log_interval_sec + 1)
 
-            payload = self.latest or {"ok": False, "emotion": None, "ts": time.time()}
-            emo = payload.get("emotion")
-            ts = datetime.utcnow().isoformat() + "Z"
-
-            line = f"{ts}\temotion={emo}\t{note}\n"
-            with fp.open("a", encoding="utf-8") as f:
-                f.write(line)
+        with self._lock:
+            files = list(self._log_files.values())
+            self._log_files.clear()
+            self._logging_sessions.clear()
+
+        for f in files:
+            try:
+                f.close()
+            except Exception as e:
+                print("[emotion] close log error:", e)
+        print(f"[emotion] closed {len(files)} log file(s)")
+
+    def _append_line(self, session_ids: List[str], line: str):
+        # cùng 1 dòng cho mọi session trong tick -> format 1 lần, chỉ write() / session
+        try:
+            with self._lock:
+                for sid in session_ids:
+                    f = self._log_files.get(sid)
+                    if f is not None:
+                        f.write(line)
 
             # debug
-            # print(f"[emotion] appended -> {fp} : {line.strip()}")
+            # print(f"[emotion] appended -> {session_ids} : {line.strip()}")
         except Exception as e:
             print("[emotion] append_line error:", e)
 
@@ -126,33 +195,100 @@ class EmotionService:
 
             payload = self.latest or {"ok": False, "emotion": None, "ts": time.time()}
             emo = payload.get("emotion")
-            ts = datetime.utcnow().isoformat() + "Z"
+            ts = _iso_z()
 
-            for sid in session_ids:
-                self._append_line(sid)
+            self._append_line(session_ids, f"{ts}\temotion={emo}\t\n")
 
             print(f"[emotion] logged {len(session_ids)} session(s) @ {ts} emotion={emo}")
 
         print("[emotion] log loop stopped")
 
     # ---------- prediction ----------
+    def export_int8_onnx(self, out_path: str = EMOTION_ONNX_PATH) -> str:
+        """
+        One-off: Keras emotion model -> ONNX (tf2onnx) -> INT8 weights (dynamic quantization).
+        Restart the service afterwards; __init__ picks up the file at EMOTION_ONNX_PATH.
+        """
+        import tensorflow as tf
+        import tf2onnx
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        fp32_path = str(Path(out_path).with_name("emotion.fp32.onnx"))
+        spec = (tf.TensorSpec((None, 48, 48, 1), tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(self.model, input_signature=spec, output_path=fp32_path)
+        quantize_dynamic(fp32_path, out_path, weight_type=QuantType.QInt8)
+        return out_path
+
     def _predict_emotion_from_bgr(self, face_bgr: np.ndarray):
-        g = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2GRAY)
-        g = cv2.resize(g, (48, 48), interpolation=cv2.INTER_AREA)
-        g = g.astype("float32") / 255.0
-        g = g.reshape(1, 48, 48, 1)
+        gray = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2GRAY)
 
+        # buffers dùng lại giữa các frame -> giữ model_lock suốt lúc ghi + infer
         with self.model_lock:
-            probs = self.model.predict(g, verbose=0)[0]
+            cv2.resize(gray, (48, 48), dst=self._gray_buf, interpolation=cv2.INTER_AREA)
+            np.divide(self._gray_buf, np.float32(255.0), out=self._in_buf[0, :, :, 0], dtype=np.float32)
+
+            if self._ort_sess is not None:
+                probs = self._ort_sess.run(None, {self._ort_input: self._in_buf})[0][0]
+            else:
+                # gọi model trực tiếp thay vì predict(): bỏ overhead callbacks/progress của Keras cho batch=1
+                probs = np.asarray(self.model(self._in_buf, training=False))[0]
 
         idx = int(np.argmax(probs))
         return emotion_labels[idx], probs.tolist()
 
+    def _detect_largest_face(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        if self._face_det is not None:
+            res = self._face_det.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if not res.detections:
+                return None
+            fh, fw = frame.shape[:2]
+            best = None
+            for d in res.detections:
+                bb = d.location_data.relative_bounding_box
+                x = max(0, int(bb.xmin * fw))
+                y = max(0, int(bb.ymin * fh))
+                w = min(fw - x, int(bb.width * fw))
+                h = min(fh - y, int(bb.height * fh))
+                if best is None or w * h > best[2] * best[3]:
+                    best = (x, y, w, h)
+            return best
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+        if len(faces) == 0:
+            return None
+        return tuple(max(faces, key=lambda b: b[2] * b[3]))
+
+    def _open_capture(self) -> "cv2.VideoCapture":
+        hw_params = []
+        if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):  # OpenCV >= 4.5.2
+            hw_params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+
+        if sys.platform == "win32":
+            # Media Foundation + MJPG: decode có thể chạy trên GPU (D3D11); lỗi -> DirectShow như cũ
+            backends = [cv2.CAP_MSMF, cv2.CAP_DSHOW]
+        else:
+            backends = [cv2.CAP_V4L2, cv2.CAP_ANY]
+
+        cap = None
+        for backend in backends:
+            params = hw_params if backend == cv2.CAP_MSMF else []
+            try:
+                cap = cv2.VideoCapture(self.cam_index, backend, params)
+            except (TypeError, cv2.error):
+                # OpenCV < 4.5.2 không có overload (index, api, params)
+                cap = cv2.VideoCapture(self.cam_index, backend)
+            if cap.isOpened():
+                cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+                print(f"[emotion] camera backend={cap.getBackendName()}")
+                return cap
+            cap.release()
+        return cap
+
     def _cam_loop(self):
         print(f"[emotion] _cam_loop entered, opening camera index={self.cam_index}")
 
-        # Windows: dùng DirectShow cho ổn định
-        cap = cv2.VideoCapture(self.cam_index, cv2.CAP_DSHOW)
+        cap = self._open_capture()
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         cap.set(cv2.CAP_PROP_FPS, 30)
@@ -185,14 +321,13 @@ class EmotionService:
                 continue
             last = now
 
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+            box = self._detect_largest_face(frame)
 
             label = None
             probs = None
 
-            if len(faces) > 0:
-                x, y, w, h = max(faces, key=lambda b: b[2] * b[3])
+            if box is not None:
+                x, y, w, h = box
                 if w >= 20 and h >= 20:
                     face_bgr = frame[y:y+h, x:x+w]
                     try:
@@ -1,11 +1,17 @@
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 from datetime import datetime
+import asyncio
 import re
+import threading
+from cachetools import TTLCache
 from fastapi import HTTPException
 from src.engines.llm_engine import get_llm_engine
 from pathlib import Path
 
+_SEP = "\n" + "-" * 60
+_ROLE_RE = re.compile(r"(Senior|Junior|Lead)?\s*([A-Za-z ]+(Engineer|Developer|Scientist|Manager))", re.I)
+
 _engine = get_llm_engine()
 
 def llm_chat(system: str, user: str) -> str:
@@ -14,74 +20,111 @@ def llm_chat(system: str, user: str) -> str:
         {"role": "user", "content": user},
     ])
 
-@dataclass
+async def llm_chat_async(system: str, user: str) -> str:
+    return await _engine.achat([
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ])
+
+def _ensure_question(text: str) -> str:
+    # strip + đảm bảo kết thúc bằng "?" ("" -> "?")
+    text = text.strip()
+    return text if text.endswith("?") else text.rstrip(".") + "?"
+
+@dataclass(slots=True)
 class MockTurn:
     question: Optional[str]
     answer: Optional[str]
     time: datetime = field(default_factory=datetime.utcnow)
     summary: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class MockSession:
     session_id: str
     cv_text: str
     jd_text: str
     role: Optional[str]
     turns: List[MockTurn] = field(default_factory=list)
+    role_resolved: Optional[str] = None  # role hoặc role suy ra từ JD, tính 1 lần lúc start
+    # turns bị sửa trên event loop (process_turn) và đọc trong threadpool (export) -> lock theo session
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+SESSION_MAXSIZE = 10_000
+SESSION_TTL_S = 3600  # tính từ lần tương tác cuối (mỗi turn refresh lại)
 
 class MockAgentService:
     def __init__(self) -> None:
-        self.sessions: Dict[str, MockSession] = {}
+        # bounded + tự dọn session idle, thay cho dict không giới hạn
+        self.sessions: TTLCache = TTLCache(maxsize=SESSION_MAXSIZE, ttl=SESSION_TTL_S)
+        self._sessions_lock = threading.Lock()  # TTLCache không thread-safe (start/export chạy trong threadpool)
+
+    @property
+    def active_sessions(self) -> int:
+        with self._sessions_lock:
+            return len(self.sessions)
+
+    def _get_session(self, session_id: str, touch: bool = False) -> Optional[MockSession]:
+        with self._sessions_lock:
+            s = self.sessions.get(session_id)
+            if s is not None and touch:
+                self.sessions[session_id] = s  # re-set -> reset TTL
+            return s
 
     def _role_from_jd(self, jd_text: str, fallback: Optional[str]) -> str:
         if fallback:
             return fallback
-        m = re.search(r"(Senior|Junior|Lead)?\s*([A-Za-z ]+(Engineer|Developer|Scientist|Manager))", jd_text, re.I)
+        m = _ROLE_RE.search(jd_text)
         return m.group(0).strip() if m else "the position"
 
     def start_session(self, session_id: str, cv_text: str, jd_text: str, role: Optional[str]) -> str:
         if not cv_text or not jd_text:
             print(f"[mock/start] Missing text. cv_len={len(cv_text or '')}, jd_len={len(jd_text or '')}")
             raise HTTPException(status_code=400, detail="cv_text and jd_text are required")
-        self.sessions[session_id] = MockSession(session_id=session_id, cv_text=cv_text, jd_text=jd_text, role=role)
+        s = MockSession(session_id=session_id, cv_text=cv_text, jd_text=jd_text, role=role)
+        s.role_resolved = self._role_from_jd(jd_text, role)
+        with self._sessions_lock:
+            self.sessions[session_id] = s
 
-        role_name = self._role_from_jd(jd_text, role)
+        role_name = s.role_resolved
         sys = "You are an adaptive interviewer. Ask one clear opening question ending with '?'."
         usr = f"Role: {role_name}\nCV:\n{cv_text[:4000]}\nJD:\n{jd_text[:4000]}"
-        first_q = llm_chat(sys, usr).strip()
-        if not first_q.endswith("?"):
-            first_q = first_q.rstrip(".") + "?"
-        self.sessions[session_id].turns.append(MockTurn(question=first_q, answer=None))
+        first_q = _ensure_question(llm_chat(sys, usr))
+        with s.lock:
+            s.turns.append(MockTurn(question=first_q, answer=None))
         return first_q
 
-    def process_turn(self, session_id: str, user_answer: str) -> Dict:
-        if session_id not in self.sessions:
+    async def process_turn(self, session_id: str, user_answer: str) -> Dict:
+        s = self._get_session(session_id, touch=True)
+        if s is None:
             raise HTTPException(status_code=400, detail="Invalid session_id. Call /mock/start first.")
-        s = self.sessions[session_id]
 
-        if s.turns and s.turns[-1].answer is None:
-            s.turns[-1].answer = user_answer
-        else:
-            s.turns.append(MockTurn(question=None, answer=user_answer))
+        with s.lock:
+            if s.turns and s.turns[-1].answer is None:
+                s.turns[-1].answer = user_answer
+            else:
+                s.turns.append(MockTurn(question=None, answer=user_answer))
+            turn = s.turns[-1]
 
         sys_r = "Analyze the answer; return concise summary linked to JD/CV. Max 120 words."
         usr_r = f"JD:\n{s.jd_text[:3000]}\nCV:\n{s.cv_text[:3000]}\nAnswer:\n{user_answer}"
-        reasoning = llm_chat(sys_r, usr_r).strip()
-        s.turns[-1].summary = reasoning
 
-        role_name = self._role_from_jd(s.jd_text, s.role)
+        role_name = s.role_resolved
         sys_q = "Ask exactly one concise follow-up question ending with '?'."
         usr_q = f"Role: {role_name}\nJD:\n{s.jd_text[:2500]}\nCV:\n{s.cv_text[:2500]}\nLast answer:\n{user_answer}"
-        next_q = llm_chat(sys_q, usr_q).strip()
-        if not next_q.endswith("?"):
-            next_q = next_q.rstrip(".") + "?"
-        s.turns.append(MockTurn(question=next_q, answer=None))
+
+        # summary và câu hỏi tiếp theo độc lập nhau -> gọi LLM song song
+        reasoning, next_q = await asyncio.gather(llm_chat_async(sys_r, usr_r), llm_chat_async(sys_q, usr_q))
+        reasoning = reasoning.strip()
+        next_q = _ensure_question(next_q)
+        with s.lock:
+            turn.summary = reasoning
+            s.turns.append(MockTurn(question=next_q, answer=None))
         return {"reasoning_summary": reasoning, "next_question": next_q, "followups": []}
     def export_transcript_txt(self, session_id: str, out_dir: str = "exports") -> str:
-        if session_id not in self.sessions:
+        s = self._get_session(session_id)
+        if s is None:
             raise HTTPException(status_code=404, detail="Session not found")
 
-        s = self.sessions[session_id]
         Path(out_dir).mkdir(parents=True, exist_ok=True)
 
         # Tên file an toàn (tránh ký tự lạ)
@@ -89,37 +132,32 @@ class MockAgentService:
         ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
         file_path = Path(out_dir) / f"mock_{safe_sid}_{ts}.txt"
 
-        lines = []
-        lines.append("=== MOCK INTERVIEW TRANSCRIPT ===")
-        lines.append(f"Session: {s.session_id}")
-        lines.append(f"Role: {s.role or self._role_from_jd(s.jd_text, None)}")
-        lines.append(f"Exported (UTC): {datetime.utcnow().isoformat()}Z")
-        lines.append("")
-
-        q_idx = 0
-        for t in s.turns:
-            # mỗi turn của bạn thường là: (question, answer, summary)
-            if t.question:
-                q_idx += 1
-                lines.append(f"[Q{q_idx}] ({t.time.isoformat()}Z)")
-                lines.append(t.question)
-                lines.append("")
-
-            if t.answer:
-                lines.append(f"[A{q_idx}] ({t.time.isoformat()}Z)")
-                lines.append(t.answer)
-                lines.append("")
-
-            if t.summary:
-                lines.append(f"[Summary Q{q_idx}]")
-                lines.append(t.summary)
-                lines.append("")
-
-            lines.append("-" * 60)
-
-        content = "\n".join(lines)
-
-        # Ghi UTF-8 để không lỗi tiếng Việt
-        file_path.write_text(content, encoding="utf-8")
+        # snapshot dưới lock: turn đang chạy song song không làm transcript bị ghi nửa chừng
+        with s.lock:
+            turns = [(t.time, t.question, t.answer, t.summary) for t in s.turns]
+
+        # stream thẳng vào file (không build list + join); output giữ y hệt bản "\n".join cũ:
+        # mỗi block bắt đầu bằng "\n", file không có newline cuối
+        with open(file_path, "w", encoding="utf-8", buffering=1 << 16) as f:
+            w = f.write
+            w(
+                "=== MOCK INTERVIEW TRANSCRIPT ===\n"
+                f"Session: {s.session_id}\n"
+                f"Role: {s.role_resolved}\n"
+                f"Exported (UTC): {datetime.utcnow().isoformat()}Z\n"
+            )
+
+            q_idx = 0
+            for t_time, question, answer, summary in turns:
+                iso_ts = t_time.isoformat()
+                # mỗi turn của bạn thường là: (question, answer, summary)
+                if question:
+                    q_idx += 1
+                    w(f"\n[Q{q_idx}] ({iso_ts}Z)\n{question}\n")
+                if answer:
+                    w(f"\n[A{q_idx}] ({iso_ts}Z)\n{answer}\n")
+                if summary:
+                    w(f"\n[Summary Q{q_idx}]\n{summary}\n")
+                w(_SEP)
 
         return str(file_path)
\ No newline at end of file
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# chạy pytest từ cs311be/ hoặc repo root đều import được "src.*"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,176 @@
+import asyncio
+
+import orjson
+import pytest
+
+import src.services.evaluation_service as ev
+
+TRANSCRIPT = (
+    "[Q1] (2025-01-01T00:00:00Z)\nTell me about overfitting.\n"
+    "[A1] (2025-01-01T00:00:05Z)\nThe model memorises the training set and fails to generalise.\n"
+)
+EMOTION_LOG = "2025-01-01T00:00:00.000Z\temotion=happy\n2025-01-01T00:00:01.000Z\temotion=neutral\n"
+JUDGEMENT = {"scores": {"knowledge": {"score": 7}, "attitude": {"score": 8}}}
+# đúng schema của _JUDGE_FAST_TEMPLATE: chỉ có số, không reasons/evidence/summaries
+FAST_JUDGEMENT = {
+    "scores": {
+        "knowledge": {"score": 6.5, "subscores": {f"K{i}": {"score": 6.5} for i in range(1, 6)}},
+        "attitude": {"score": 9.0, "subscores": {f"A{i}": {"score": 9.0} for i in range(1, 6)}},
+        "final": {"score": 7.25, "weights": {"knowledge": 0.7, "attitude": 0.3}},
+    }
+}
+
+
+class StubGPT:
+    """Stands in for AzureGPTClient: no network, every batch request gets the same judgement."""
+
+    deployment = "stub"
+    batch_deployment = "stub-batch"
+
+    def __init__(self):
+        self.submitted = []
+        self.calls = []
+
+    def run_batch(self, requests, poll_interval=30.0):
+        self.submitted.extend(r["custom_id"] for r in requests)
+        self.bodies = [r["body"] for r in requests]
+        reply = FAST_JUDGEMENT if requests and "max_tokens" in requests[0]["body"] else JUDGEMENT
+        return {r["custom_id"]: orjson.dumps(reply).decode() for r in requests}
+
+    def judge_packed(self, messages, n_sessions, fast=False):
+        self.calls.append(("packed", n_sessions))
+        # chỉ trả session 0 -> các session còn lại phải fallback từng call
+        return {"results": [{"session_idx": 0, **JUDGEMENT}]}
+
+    def judge(self, messages):
+        self.calls.append(("single", 1))
+        return JUDGEMENT
+
+    judge_stream = judge
+
+
+@pytest.fixture
+def stub_gpt(monkeypatch, tmp_path):
+    gpt = StubGPT()
+    monkeypatch.setattr(ev, "_get_client", lambda: gpt)
+    cache = ev.JudgeCache(path=str(tmp_path / "judge_cache.jsonl"))
+    monkeypatch.setattr(ev, "get_judge_cache", lambda: cache)
+    return gpt
+
+
+def test_evaluate_many_records_load_errors_per_session(stub_gpt, tmp_path):
+    for sid in ("s1", "s2"):
+        (tmp_path / f"mock_{sid}.txt").write_text(TRANSCRIPT, encoding="utf-8")
+    (tmp_path / "emotion_s1.txt").write_text(EMOTION_LOG, encoding="utf-8")  # s2: thiếu emotion file
+
+    reports = ev.EvaluationService(base_dir=str(tmp_path)).evaluate_many(["s1", "s2", "s3"])
+
+    assert list(reports) == ["s1", "s2", "s3"]
+    assert stub_gpt.submitted == ["s1"]
+    assert reports["s1"]["agent"]["error"] is None
+    assert reports["s1"]["agent"]["scores"]["knowledge_score"] > 0  # sau data-sufficiency adjust (chỉ 1 câu trả lời)
+    assert reports["s2"]["error"].startswith("FileNotFoundError")
+    assert reports["s3"]["error"].startswith("FileNotFoundError")
+
+
+def test_evaluate_many_packed_falls_back_per_session(stub_gpt, tmp_path):
+    for sid in ("s1", "s2", "s3"):
+        (tmp_path / f"mock_{sid}.txt").write_text(TRANSCRIPT.replace("overfitting", sid), encoding="utf-8")
+        (tmp_path / f"emotion_{sid}.txt").write_text(EMOTION_LOG, encoding="utf-8")
+
+    reports = ev.EvaluationService(base_dir=str(tmp_path)).evaluate_many(["s1", "s2", "s3"], pack_size=2)
+
+    assert stub_gpt.submitted == []  # không qua Batch API
+    assert stub_gpt.calls == [("packed", 2), ("single", 1), ("packed", 1)]
+    for sid in ("s1", "s2", "s3"):
+        agent = reports[sid]["agent"]
+        assert agent["error"] is None
+        assert "session_idx" not in agent["explanation"]
+        assert agent["explanation"]["data_sufficiency"] == reports[sid]["overall"]["data_sufficiency"]
+
+
+def test_scores_only_schema_is_parsed(stub_gpt):
+    agent = ev.EvaluationAgentService(fast=True)
+    one = agent.scores_from_judgement(FAST_JUDGEMENT)
+    (many, err), (bad, bad_err) = agent.scores_from_judgements([FAST_JUDGEMENT, {"scores": {}}])
+    assert (one.knowledge_score, one.attitude_score, one.agent_final_score) == (6.5, 9.0, 7.25)
+    assert many == one and err is None
+    assert bad is None and bad_err.startswith("KeyError")
+
+
+def test_evaluate_many_fast_uses_scores_only_prompt(stub_gpt, tmp_path):
+    (tmp_path / "mock_s1.txt").write_text(TRANSCRIPT, encoding="utf-8")
+    (tmp_path / "emotion_s1.txt").write_text(EMOTION_LOG, encoding="utf-8")
+
+    reports = ev.EvaluationService(base_dir=str(tmp_path)).evaluate_many(["s1"], fast=True)
+
+    (body,) = stub_gpt.bodies
+    assert body["temperature"] == 0.0 and body["max_tokens"] == ev.JUDGE_FAST_MAX_TOKENS
+    assert "FAST MODE" in body["messages"][0]["content"]
+    assert reports["s1"]["agent"]["error"] is None
+    assert reports["s1"]["agent"]["explanation"]["scores"]["final"]["score"] == 7.25
+
+
+class FakeBatchClient:
+    """files/batches of the openai SDK: batch stays in_progress until cancelled, then has 1 of 2 results."""
+
+    def __init__(self):
+        self.created = {}
+        self.cancelled = False
+        self.files = self
+        self.batches = self
+
+    # files
+    def create(self, file=None, purpose=None, **batch_kwargs):
+        if file is not None:
+            self.uploaded = [orjson.loads(l) for l in file.read().splitlines()]
+            return type("F", (), {"id": "file-in"})()
+        self.created = batch_kwargs
+        return self._batch()
+
+    def content(self, file_id):
+        line = {"custom_id": "s1", "response": {"body": {"choices": [{"message": {"content": '{"ok": 1}'}}]}}}
+        return type("C", (), {"text": orjson.dumps(line).decode() + "\n"})()
+
+    # batches
+    def _batch(self):
+        status = "cancelled" if self.cancelled else "in_progress"
+        return type("B", (), {"id": "batch-1", "status": status, "output_file_id": "file-out" if self.cancelled else None})()
+
+    def retrieve(self, batch_id):
+        return self._batch()
+
+    def cancel(self, batch_id):
+        self.cancelled = True
+        return type("B", (), {"id": batch_id, "status": "cancelling", "output_file_id": None})()
+
+
+def test_run_batch_uses_azure_endpoint_and_returns_partial_results_on_timeout():
+    gpt = ev.AzureGPTClient.__new__(ev.AzureGPTClient)  # không cần env/openai
+    gpt.client = FakeBatchClient()
+    reqs = [{"custom_id": sid, "method": "POST", "url": "/chat/completions", "body": {}} for sid in ("s1", "s2")]
+
+    out = gpt.run_batch(reqs, poll_interval=0.0, timeout=0.0)
+
+    assert gpt.client.created["endpoint"] == "/chat/completions"
+    assert gpt.client.cancelled
+    assert out == {"s1": '{"ok": 1}'}
+
+
+def test_batch_request_targets_batch_deployment(stub_gpt):
+    req = ev.EvaluationAgentService().build_batch_request([], "ai_engineer", custom_id="s1")
+    assert req["url"] == "/chat/completions"
+    assert req["body"]["model"] == "stub-batch"
+
+
+def test_evaluate_concurrent_maps_failed_sessions_to_errors(monkeypatch, tmp_path):
+    monkeypatch.setattr(ev, "_missing_azure_envs", lambda: ["AZURE_OPENAI_ENDPOINT"])  # chỉ chấm emotion
+    (tmp_path / "mock_s1.txt").write_text(TRANSCRIPT, encoding="utf-8")
+    (tmp_path / "emotion_s1.txt").write_text(EMOTION_LOG, encoding="utf-8")
+
+    svc = ev.EvaluationService(base_dir=str(tmp_path))
+    reports = asyncio.run(svc.evaluate_concurrent(["s1", "s9"], max_concurrency=2))
+
+    assert reports["s1"]["inputs"]["session_id"] == "s1"
+    assert reports["s1"]["emotion"]["total_events"] == 2
+    assert reports["s9"]["error"].startswith("FileNotFoundError")
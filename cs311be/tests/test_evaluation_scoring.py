@@ -0,0 +1,38 @@
+import importlib.util
+import sys
+
+import orjson
+import pytest
+
+import src.services.evaluation_service as ev
+
+EMOTION_LOG = "\n".join(
+    f"2025-01-01T00:00:{i:02d}.000Z\temotion={emo}"
+    for i, emo in enumerate(["happy", "neutral", "sad", "happy", "none", "angry", "surprise"])
+)
+# tính trước với module thật (numba, nếu có) - trong fixture bên dưới numba bị chặn import
+EXPECTED = ev.score_emotion_face_base10(ev.parse_emotions(EMOTION_LOG))
+
+
+@pytest.fixture
+def ev_without_numba(monkeypatch):
+    """Fresh copy of evaluation_service loaded with numba unavailable (njit = pure-Python shim)."""
+    monkeypatch.setitem(sys.modules, "numba", None)
+    spec = importlib.util.spec_from_file_location("_ev_no_numba", ev.__file__)
+    mod = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, spec.name, mod)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def test_emotion_score_is_plain_float_with_njit_shim(ev_without_numba):
+    mod = ev_without_numba
+    score, detail = mod.score_emotion_face_base10(mod.parse_emotions(EMOTION_LOG))
+
+    assert type(score) is float
+    assert type(detail["score"]) is float
+    # cùng kết quả với bản numba
+    assert (score, detail) == EXPECTED
+
+    overall = mod.compute_total_patched(score, None)
+    orjson.dumps({"score": score, "detail": detail, "overall": overall})
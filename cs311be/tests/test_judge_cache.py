@@ -0,0 +1,39 @@
+import time
+
+import orjson
+
+import src.services.evaluation_service as ev
+
+
+def _lines(path):
+    return [orjson.loads(l) for l in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_expired_entry_is_dropped_and_compacted_on_reload(tmp_path):
+    path = tmp_path / "judge_cache.jsonl"
+    cache = ev.JudgeCache(path=str(path), ttl=60)
+    cache.put("old", {"scores": 1})
+    cache.put("new", {"scores": 2})
+    cache.put("new", {"scores": 3})  # ghi đè -> dòng cũ thành rác
+    # giả lập entry "old" được ghi từ 2 phút trước
+    recs = _lines(path)
+    recs[0]["ts"] = time.time() - 120
+    path.write_bytes(b"".join(orjson.dumps(r) + b"\n" for r in recs))
+
+    reloaded = ev.JudgeCache(path=str(path), ttl=60)
+
+    assert reloaded.get("old") is None
+    assert reloaded.get("new") == {"scores": 3}
+    assert [(r["key"], r["data"]) for r in _lines(path)] == [("new", {"scores": 3})]
+
+
+def test_put_compacts_when_file_passes_max_bytes(tmp_path):
+    path = tmp_path / "judge_cache.jsonl"
+    cache = ev.JudgeCache(path=str(path), maxsize=2, max_bytes=200)
+    for i in range(10):
+        cache.put(f"k{i}", {"scores": i})
+
+    keys = [r["key"] for r in _lines(path)]
+    assert len(keys) <= 4  # không phình ra 10 dòng
+    assert keys[-2:] == ["k8", "k9"]
+    assert ev.JudgeCache(path=str(path), maxsize=2).get("k9") == {"scores": 9}
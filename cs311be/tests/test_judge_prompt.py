@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+import src.services.evaluation_service as ev
+
+regex = pytest.importorskip("regex")
+
+# pre-tokenizer của o200k_base (gpt-4o): BPE không bao giờ gộp 2 chunk -> số chunk là cận dưới của số token
+_O200K_PAT = regex.compile(
+    r"[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?"
+    r"|[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?"
+    r"|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n/]*|\s*[\r\n]+|\s+(?!\S)|\s+"
+)
+AZURE_PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+def test_full_judge_prompt_shares_a_cacheable_prefix_across_weights():
+    a = ev._judge_system_prompt(0.7, 0.3)
+    b = ev._judge_system_prompt(0.5, 0.5)
+    shared = os.path.commonprefix([a, b])
+    assert len(_O200K_PAT.findall(shared)) >= AZURE_PROMPT_CACHE_MIN_TOKENS
+    assert shared.startswith(a[: a.index("\nWEIGHTS (")])  # rubric + schema đều nằm trong prefix chung
+    assert a.rstrip().endswith("w_attitude = 0.3")
@@ -0,0 +1,36 @@
+import threading
+import time
+
+import src.services.evaluation_service as ev
+
+
+def test_pacer_spaces_calls_across_threads(monkeypatch):
+    slept = []
+    monkeypatch.setattr(ev.time, "sleep", slept.append)
+    pacer = ev._RequestPacer(rate_per_minute=600)  # 1 call / 0.1s
+
+    threads = [threading.Thread(target=pacer.wait) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # call đầu chạy ngay, 4 call sau chờ lần lượt ~0.1, 0.2, 0.3, 0.4s
+    assert len(slept) == 4
+    assert sorted(round(x, 1) for x in slept) == [0.1, 0.2, 0.3, 0.4]
+
+
+def test_judge_calls_go_through_the_pacer(monkeypatch):
+    waits = []
+    monkeypatch.setattr(ev, "_judge_pacer", lambda: type("P", (), {"wait": lambda self: waits.append(1)})())
+
+    class Completions:
+        def create(self, **kwargs):
+            msg = type("M", (), {"content": "{}"})()
+            return type("R", (), {"choices": [type("C", (), {"message": msg})()], "usage": None})()
+
+    gpt = ev.AzureGPTClient.__new__(ev.AzureGPTClient)
+    gpt.deployment = "stub"
+    gpt.client = type("Cl", (), {"chat": type("Ch", (), {"completions": Completions()})()})()
+    gpt._complete([{"role": "user", "content": "x"}], 0.0)
+    assert waits == [1]